@@ -6,8 +6,17 @@ from discord import app_commands
 from PIL import Image, ImageDraw
 import random
 import asyncio
-import math
+import time
 import re
+from game_logic import (
+    check_board_win, choose_move, ai_levels,
+    load_opening_book, load_difficulties, custom_levels, level_loss_rates
+)
+from matchmaking import (
+    MatchQueue, QueueEntry, DEFAULT_RATING,
+    update_ratings, ai_level_for_rating, load_ratings, save_ratings
+)
+from image_cache import ImageCache, CachedImage, board_cache_key
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +27,13 @@ if not TOKEN:
     print("❌ Error: TOKEN not found in .env file")
     exit(1)
 
+# Optional channel the bot uploads each distinct board image to once, so
+# later embeds can reuse its CDN URL instead of uploading the PNG again
+IMAGE_CHANNEL_ID = os.getenv("IMAGE_CHANNEL_ID")
+IMAGE_CHANNEL_ID = int(IMAGE_CHANNEL_ID) if IMAGE_CHANNEL_ID and IMAGE_CHANNEL_ID.isdigit() else None
+IMAGE_CACHE_PATH = "image_cache.json"
+IMAGE_CACHE_SAVE_INTERVAL = 60  # seconds
+
 # Bot configuration
 BOARD_SIZE = 400
 CELL_SIZE = BOARD_SIZE // 3
@@ -33,6 +49,18 @@ ACCENT_COLORS = [
     (80, 200, 220)
 ]
 
+# AI data generated offline by selfplay.py
+OPENING_BOOK_PATH = "opening_book.json"
+DIFFICULTIES_PATH = "difficulties.json"
+
+# Player ratings, kept across restarts
+RATINGS_PATH = "ratings.json"
+
+# Matchmaking queue (seconds)
+QUEUE_TIMEOUT = 300
+AI_FALLBACK_AFTER = 60
+QUEUE_SWEEP_INTERVAL = 5
+
 # Enable necessary intents
 intents = discord.Intents.default()
 intents.message_content = True
@@ -48,11 +76,29 @@ class TicTacToeBot(commands.Bot):
         )
         self.games = {}
         self.locks = {}  # For concurrency control
+        self.queue = MatchQueue(QUEUE_TIMEOUT, AI_FALLBACK_AFTER)
+        self.ratings = {}  # user_id -> Elo rating
+        self.image_cache = ImageCache()
 
     async def setup_hook(self):
+        book_size = load_opening_book(OPENING_BOOK_PATH)
+        level_count = load_difficulties(DIFFICULTIES_PATH)
+        self.ratings = load_ratings(RATINGS_PATH)
+        print(f"🏆 Loaded ratings for {len(self.ratings)} players")
+        if IMAGE_CHANNEL_ID:
+            cached = self.image_cache.load(IMAGE_CACHE_PATH, time.time())
+            print(f"🖼️ Loaded {cached} cached board images")
+            asyncio.create_task(image_cache_saver())
+        print(f"📖 Loaded {book_size} opening book positions and {level_count} custom AI levels")
+        asyncio.create_task(queue_sweeper())
         await self.tree.sync()
         print("✅ Slash commands synced globally")
 
+    async def close(self):
+        if IMAGE_CHANNEL_ID and self.image_cache.dirty:
+            save_image_cache()
+        await super().close()
+
 bot = TicTacToeBot()
 
 class GameState:
@@ -67,6 +113,7 @@ class GameState:
         ]
         self.difficulty = difficulty
         self.is_against_ai = isinstance(p2, str)  # AI is represented as string
+        self.mirrors = {}  # channel_id -> board message id, for games shown in several channels
 
     def mark(self, row, col):
         if self.board[row][col] != "":
@@ -77,26 +124,6 @@ class GameState:
     def check_win(self):
         return check_board_win(self.board)  # Use unified win check
 
-# Unified win check function
-def check_board_win(board):
-    # Check rows
-    for row in board:
-        if row[0] == row[1] == row[2] != "":
-            return row[0]
-    # Check columns
-    for col in range(3):
-        if board[0][col] == board[1][col] == board[2][col] != "":
-            return board[0][col]
-    # Check diagonals
-    if board[0][0] == board[1][1] == board[2][2] != "":
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] != "":
-        return board[0][2]
-    # Check for draw
-    if all(cell != "" for row in board for cell in row):
-        return "Draw"
-    return None
-
 def draw_x(draw, x, y, size, color, width):
     offset = size * 0.2
     draw.line([(x + offset, y + offset), 
@@ -138,6 +165,8 @@ def draw_board(board, colors):
             elif mark == "O":
                 draw_o(draw, x, y, mark_size, O_COLOR, mark_width)
     
+    # Corner colors depend only on the board so identical boards render identically
+    corner_rng = random.Random(board_cache_key(board, colors))
     corner_size = CELL_SIZE // 4
     for pos in [(0, 0), (BOARD_SIZE - corner_size, 0),
                 (0, BOARD_SIZE - corner_size), 
@@ -145,7 +174,7 @@ def draw_board(board, colors):
         draw.rectangle([pos[0], pos[1], 
                         pos[0] + corner_size, 
                         pos[1] + corner_size], 
-                       fill=random.choice(colors))
+                       fill=corner_rng.choice(colors))
     
     return img
 
@@ -158,107 +187,111 @@ def create_embed(title, description, color=0x3498db):
     embed.set_footer(text="Tic Tac Toe Ultimate | /commands for help")
     return embed
 
-# AI Logic
-def get_empty_cells(board):
-    return [(r, c) for r in range(3) for c in range(3) if board[r][c] == ""]
-
-def get_random_move(board):
-    empty = get_empty_cells(board)
-    return random.choice(empty) if empty else (0, 0)
-
-def get_medium_move(board, ai_mark):
-    # Try to win if possible
-    for r, c in get_empty_cells(board):
-        board[r][c] = ai_mark
-        if check_board_win(board) == ai_mark:
-            board[r][c] = ""
-            return r, c
-        board[r][c] = ""
-    
-    # Block opponent win
-    opponent_mark = "O" if ai_mark == "X" else "X"
-    for r, c in get_empty_cells(board):
-        board[r][c] = opponent_mark
-        if check_board_win(board) == opponent_mark:
-            board[r][c] = ""
-            return r, c
-        board[r][c] = ""
-    
-    # Strategic moves
-    if board[1][1] == "":  # Center is best
-        return 1, 1
-    
-    # Take a corner if available
-    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
-    empty_corners = [c for c in corners if board[c[0]][c[1]] == ""]
-    if empty_corners:
-        return random.choice(empty_corners)
-    
-    # Otherwise random
-    return get_random_move(board)
-
-def minimax(board, depth, is_maximizing, ai_mark, alpha=-math.inf, beta=math.inf):
-    opponent_mark = "O" if ai_mark == "X" else "X"
-    
-    # Check game state
-    result = check_board_win(board)
-    if result == ai_mark:
-        return 10 - depth
-    elif result == opponent_mark:
-        return depth - 10
-    elif result == "Draw":
-        return 0
-    
-    if is_maximizing:
-        best_score = -math.inf
-        for r, c in get_empty_cells(board):
-            board[r][c] = ai_mark
-            score = minimax(board, depth + 1, False, ai_mark, alpha, beta)
-            board[r][c] = ""
-            best_score = max(score, best_score)
-            alpha = max(alpha, best_score)
-            if beta <= alpha:
-                break
-        return best_score
+def get_rating(user_id):
+    return bot.ratings.get(user_id, DEFAULT_RATING)
+
+def record_rated_result(game, result):
+    """Update both players' ratings after a multiplayer game"""
+    p1, p2 = game.players
+    score = 0.5 if result == "Draw" else 1.0 if result == "X" else 0.0
+    bot.ratings[p1.id], bot.ratings[p2.id] = update_ratings(get_rating(p1.id), get_rating(p2.id), score)
+    try:
+        save_ratings(RATINGS_PATH, bot.ratings)
+    except OSError as e:
+        print(f"⚠️ Error saving ratings: {e}")
+
+def end_game(channel_id):
+    """Remove a game and its board images, along with any other channels it is mirrored to"""
+    game = bot.games.pop(channel_id)
+    for other_id in [channel_id, *game.mirrors]:
+        bot.games.pop(other_id, None)
+        try:
+            os.remove(f"board_{other_id}.png")
+        except:
+            pass
+
+async def attach_board(embed, game, file_path):
+    """Point the embed at the board image, returns True if the PNG must be uploaded with it"""
+    storage = bot.get_channel(IMAGE_CHANNEL_ID) if IMAGE_CHANNEL_ID else None
+    if not storage:
+        embed.set_image(url=f"attachment://{os.path.basename(file_path)}")
+        return True
+    
+    now = time.time()
+    key = board_cache_key(game.board, game.colors)
+    entry = bot.image_cache.get(key)
+    if entry and not entry.is_fresh(now):
+        # Signed attachment URLs expire, fetching the message gives a freshly signed one
+        try:
+            message = await storage.fetch_message(entry.message_id)
+            entry.refresh(message.attachments[0].url, now)
+            bot.image_cache.record_refresh()
+        except (discord.HTTPException, IndexError):
+            bot.image_cache.discard(key)
+            entry = None
+    
+    if entry:
+        bot.image_cache.record_hit(entry)
     else:
-        best_score = math.inf
-        for r, c in get_empty_cells(board):
-            board[r][c] = opponent_mark
-            score = minimax(board, depth + 1, True, ai_mark, alpha, beta)
-            board[r][c] = ""
-            best_score = min(score, best_score)
-            beta = min(beta, best_score)
-            if beta <= alpha:
-                break
-        return best_score
-
-def get_hard_move(board, ai_mark):
-    best_score = -math.inf
-    best_move = None
-    
-    for r, c in get_empty_cells(board):
-        board[r][c] = ai_mark
-        score = minimax(board, 0, False, ai_mark)
-        board[r][c] = ""
-        
-        if score > best_score:
-            best_score = score
-            best_move = (r, c)
+        try:
+            message = await storage.send(file=discord.File(file_path))
+        except discord.HTTPException as e:
+            print(f"⚠️ Error uploading board to image channel: {e}")
+            embed.set_image(url=f"attachment://{os.path.basename(file_path)}")
+            return True
+        attachment = message.attachments[0]
+        entry = CachedImage(attachment.url, message.id, attachment.size, now)
+        bot.image_cache.record_miss(attachment.size)
+        # Evicted or replaced boards will be uploaded again if needed, so drop their old copies
+        for evicted in bot.image_cache.put(key, entry):
+            try:
+                await storage.get_partial_message(evicted.message_id).delete()
+            except discord.HTTPException:
+                pass
     
-    return best_move
+    embed.set_image(url=entry.url)
+    return False
+
+def save_image_cache():
+    try:
+        bot.image_cache.save(IMAGE_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Error saving image cache: {e}")
+
+async def image_cache_saver():
+    """Periodically save the image cache so restarts don't re-upload every board"""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        await asyncio.sleep(IMAGE_CACHE_SAVE_INTERVAL)
+        if bot.image_cache.dirty:
+            save_image_cache()
+
+async def update_mirrors(game, channel_id, embed, file_path, needs_upload):
+    """Replace the board message in every other channel showing this game"""
+    if not game.mirrors:
+        return
+    game.mirrors[channel_id] = game.message_id
+    for other_id, message_id in game.mirrors.items():
+        if other_id == channel_id:
+            continue
+        channel = bot.get_channel(other_id)
+        if not channel:
+            continue
+        try:
+            message = await channel.fetch_message(message_id)
+            await message.delete()
+        except:
+            pass
+        message = await channel.send(
+            embed=embed,
+            file=discord.File(file_path) if needs_upload else None
+        )
+        game.mirrors[other_id] = message.id
 
 def ai_move(game):
     """Make an AI move based on difficulty level"""
     ai_mark = "O" if game.turn == 1 else "X"
-    
-    if game.difficulty == "easy":
-        return get_random_move(game.board)
-    elif game.difficulty == "medium":
-        return get_medium_move(game.board, ai_mark)
-    elif game.difficulty == "hard":
-        return get_hard_move(game.board, ai_mark)
-    
-    return get_random_move(game.board)
+    return choose_move(game.board, ai_mark, game.difficulty)
 
 async def make_ai_move(channel_id):
     """Process AI move and update game state"""
@@ -311,7 +344,7 @@ async def make_ai_move(channel_id):
             color = 0x2ecc71
         
         embed = create_embed(title, description, color)
-        embed.set_image(url=f"attachment://board_{channel_id}.png")
+        needs_upload = await attach_board(embed, game, f"board_{channel_id}.png")
         
         try:
             message = await channel.fetch_message(game.message_id)
@@ -321,7 +354,7 @@ async def make_ai_move(channel_id):
         
         await channel.send(
             embed=embed,
-            file=discord.File(f"board_{channel_id}.png")
+            file=discord.File(f"board_{channel_id}.png") if needs_upload else None
         )
         
         os.remove(f"board_{channel_id}.png")
@@ -341,7 +374,7 @@ async def make_ai_move(channel_id):
             f"Use `/move row col` to play your turn (1-3)",
             random.choice([0x1abc9c, 0x3498db])
         )
-        embed.set_image(url=f"attachment://board_{channel_id}.png")
+        needs_upload = await attach_board(embed, game, f"board_{channel_id}.png")
         
         try:
             message = await channel.fetch_message(game.message_id)
@@ -351,7 +384,7 @@ async def make_ai_move(channel_id):
         
         message = await channel.send(
             embed=embed,
-            file=discord.File(f"board_{channel_id}.png")
+            file=discord.File(f"board_{channel_id}.png") if needs_upload else None
         )
         game.message_id = message.id
         
@@ -368,7 +401,7 @@ async def on_ready():
 async def get_member(ctx, input_str):
     """Robust member lookup that handles mentions properly"""
     # First check for AI difficulties
-    if input_str.lower() in ["easy", "medium", "hard"]:
+    if input_str.lower() in ai_levels():
         return None
     
     guild = ctx.guild
@@ -415,6 +448,37 @@ async def get_member(ctx, input_str):
     
     return None
 
+async def start_game(channel_id, send, p1, p2, difficulty, embed, mirror_ids=()):
+    """Create a game, post its first board and let the AI open if it's playing"""
+    bot.games[channel_id] = GameState(p1, p2, difficulty)
+    game = bot.games[channel_id]
+    
+    # Handle AI going first
+    if game.is_against_ai:
+        game.turn = 1  # Set AI to go first
+    
+    # Create initial board
+    board_img = draw_board(game.board, game.colors)
+    board_img.save(f"board_{channel_id}.png")
+    needs_upload = await attach_board(embed, game, f"board_{channel_id}.png")
+    
+    message = await send(
+        embed=embed,
+        file=discord.File(f"board_{channel_id}.png") if needs_upload else None
+    )
+    game.message_id = message.id
+    
+    # Cross-guild games are shown in both players' DMs
+    for other_id in mirror_ids:
+        bot.games[other_id] = game
+        bot.locks[other_id] = bot.locks[channel_id]
+        game.mirrors[other_id] = None
+    await update_mirrors(game, channel_id, embed, f"board_{channel_id}.png", needs_upload)
+    
+    # If playing against AI and AI goes first
+    if game.is_against_ai and game.turn == 1:
+        await make_ai_move(channel_id)
+
 @bot.hybrid_command(name="tictactoe", description="Start a Tic-Tac-Toe game")
 @app_commands.describe(opponent="Player to challenge or 'easy', 'medium', 'hard' for AI")
 async def tictactoe(ctx, opponent: str):
@@ -426,7 +490,7 @@ async def tictactoe(ctx, opponent: str):
     async with bot.locks[channel_id]:
         # Check for AI difficulties first
         opp_lower = opponent.lower()
-        if opp_lower in ["easy", "medium", "hard"]:
+        if opp_lower in ai_levels():
             is_ai = True
             difficulty = opp_lower
             opponent_user = "AI"
@@ -436,7 +500,7 @@ async def tictactoe(ctx, opponent: str):
             if member is None:
                 return await ctx.send(embed=create_embed(
                     "Invalid Opponent", 
-                    "Please mention a valid user or use 'easy', 'medium', 'hard' for AI", 
+                    f"Please mention a valid user or use {', '.join(f'`{level}`' for level in ai_levels())} for AI", 
                     0xe74c3c
                 ))
             
@@ -459,23 +523,11 @@ async def tictactoe(ctx, opponent: str):
                     0xe74c3c
                 ))
         
-        # Create game state
-        bot.games[ctx.channel.id] = GameState(ctx.author, opponent_user, difficulty)
-        game = bot.games[ctx.channel.id]
-        
-        # Handle AI going first
-        if is_ai:
-            game.turn = 1  # Set AI to go first
-        
-        # Create initial board
-        board_img = draw_board(game.board, game.colors)
-        board_img.save(f"board_{ctx.channel.id}.png")
-        
         # Create embed based on game type
         if is_ai:
             title = "🎮 Game Against AI Started!"
             description = (f"**{ctx.author.mention} (X)** vs **AI: {difficulty.capitalize()} 🤖 (O)**\n"
-                        f"{'AI goes first! 🤖' if game.turn == 1 else f'{ctx.author.mention} goes first!'}")
+                        f"AI goes first! 🤖")
             color = 0x9b59b6
         else:
             title = "🎮 Game Started!"
@@ -484,17 +536,7 @@ async def tictactoe(ctx, opponent: str):
             color = random.choice([0x1abc9c, 0x3498db, 0x9b59b6])
         
         embed = create_embed(title, description, color)
-        embed.set_image(url=f"attachment://board_{ctx.channel.id}.png")
-        
-        message = await ctx.send(
-            embed=embed,
-            file=discord.File(f"board_{ctx.channel.id}.png")
-        )
-        game.message_id = message.id
-        
-        # If playing against AI and AI goes first
-        if is_ai and game.turn == 1:
-            await make_ai_move(ctx.channel.id)
+        await start_game(channel_id, ctx.send, ctx.author, opponent_user, difficulty, embed)
 
 @bot.hybrid_command(name="move", description="Make your move in the current game")
 @app_commands.describe(row="Row number (1-3)", column="Column number (1-3)")
@@ -566,6 +608,10 @@ async def move(ctx, row: int, column: int):
                 0xe74c3c
             ))
         
+        # Cross-guild games keep a separate board message in each DM
+        if game.mirrors:
+            game.message_id = game.mirrors[channel_id]
+        
         # Update board image
         board_img = draw_board(game.board, game.colors)
         board_img.save(f"board_{channel_id}.png")
@@ -590,7 +636,7 @@ async def move(ctx, row: int, column: int):
                 color = 0x2ecc71
             
             embed = create_embed(title, description, color)
-            embed.set_image(url=f"attachment://board_{channel_id}.png")
+            needs_upload = await attach_board(embed, game, f"board_{channel_id}.png")
             
             try:
                 message = await ctx.channel.fetch_message(game.message_id)
@@ -598,14 +644,19 @@ async def move(ctx, row: int, column: int):
             except:
                 pass
             
-            await ctx.send(
+            message = await ctx.send(
                 embed=embed,
-                file=discord.File(f"board_{channel_id}.png")
+                file=discord.File(f"board_{channel_id}.png") if needs_upload else None
             )
+            game.message_id = message.id
+            await update_mirrors(game, channel_id, embed, f"board_{channel_id}.png", needs_upload)
+            
+            if not game.is_against_ai:
+                record_rated_result(game, result)
             
             # Cleanup
             os.remove(f"board_{channel_id}.png")
-            del bot.games[channel_id]
+            end_game(channel_id)
         else:
             # Game continues
             game.turn = 1 - game.turn
@@ -629,7 +680,7 @@ async def move(ctx, row: int, column: int):
                 message_text,
                 random.choice([0x1abc9c, 0x3498db])
             )
-            embed.set_image(url=f"attachment://board_{channel_id}.png")
+            needs_upload = await attach_board(embed, game, f"board_{channel_id}.png")
             
             try:
                 message = await ctx.channel.fetch_message(game.message_id)
@@ -639,9 +690,10 @@ async def move(ctx, row: int, column: int):
             
             message = await ctx.send(
                 embed=embed,
-                file=discord.File(f"board_{channel_id}.png")
+                file=discord.File(f"board_{channel_id}.png") if needs_upload else None
             )
             game.message_id = message.id
+            await update_mirrors(game, channel_id, embed, f"board_{channel_id}.png", needs_upload)
             
             # If next player is AI, trigger AI move
             if game.is_against_ai and next_player == "AI":
@@ -653,21 +705,54 @@ async def cancel(ctx):
     if channel_id in bot.locks and channel_id in bot.games:
         async with bot.locks[channel_id]:
             if channel_id in bot.games:
-                try:
-                    os.remove(f"board_{channel_id}.png")
-                except:
-                    pass
+                game = bot.games[channel_id]
+                forfeit = ""
+                if not game.is_against_ai and ctx.author not in game.players:
+                    # Moderators may clear out a rated game without touching anyone's rating
+                    is_mod = ctx.guild and ctx.channel.permissions_for(ctx.author).manage_messages
+                    if not is_mod:
+                        return await ctx.send(embed=create_embed(
+                            "Not a Player",
+                            "Only the players can cancel a rated game!",
+                            0xe74c3c
+                        ))
+                elif not game.is_against_ai:
+                    # Once both players have moved, canceling counts as a loss for whoever is on turn
+                    moves = sum(cell != "" for row in game.board for cell in row)
+                    if moves >= 2:
+                        loser = game.players[game.turn]
+                        record_rated_result(game, "O" if game.turn == 0 else "X")
+                        forfeit = f"\n{loser.mention} forfeits - the game counts as a loss"
                 
                 try:
-                    message = await ctx.channel.fetch_message(bot.games[channel_id].message_id)
+                    message = await ctx.channel.fetch_message(game.mirrors.get(channel_id, game.message_id))
                     await message.delete()
                 except:
                     pass
                 
-                del bot.games[channel_id]
+                # Remove the board from the other channels of a cross-guild game and let them know
+                for other_id, message_id in game.mirrors.items():
+                    other = bot.get_channel(other_id)
+                    if other_id == channel_id or not other:
+                        continue
+                    try:
+                        message = await other.fetch_message(message_id)
+                        await message.delete()
+                    except:
+                        pass
+                    try:
+                        await other.send(embed=create_embed(
+                            "Game Canceled",
+                            f"{ctx.author.mention} canceled the game{forfeit}",
+                            0x95a5a6
+                        ))
+                    except:
+                        pass
+                
+                end_game(channel_id)
                 await ctx.send(embed=create_embed(
                     "Game Canceled", 
-                    "The current game has been canceled", 
+                    f"The current game has been canceled{forfeit}", 
                     0x95a5a6
                 ))
     else:
@@ -677,6 +762,233 @@ async def cancel(ctx):
             0x95a5a6
         ))
 
+async def notify_queue_entry(entry, title, description):
+    """Message a queued player in the channel they queued from"""
+    channel = bot.get_channel(entry.channel_id)
+    if not channel:
+        return
+    try:
+        await channel.send(embed=create_embed(title, description, 0xe74c3c))
+    except discord.HTTPException:
+        pass
+
+async def start_queue_match(first, second):
+    """Host a queue match in a thread, or in both players' DMs across servers"""
+    p1, p2 = first.user, second.user
+    if first.guild_id == second.guild_id:
+        channel = bot.get_channel(second.channel_id)
+        try:
+            host = await channel.create_thread(
+                name=f"{p1.display_name} vs {p2.display_name}",
+                type=discord.ChannelType.public_thread
+            )
+        except (AttributeError, discord.HTTPException):
+            host = channel  # Threads unavailable, play in the channel itself
+        mirrors = []
+    else:
+        try:
+            host = await p1.create_dm()
+            mirrors = [(await p2.create_dm()).id]
+        except discord.HTTPException:
+            host = None
+    
+    if host is None or host.id in bot.games or any(m in bot.games for m in mirrors):
+        # Nowhere free to play right now, keep both players searching
+        bot.queue.add(first, time.monotonic())
+        bot.queue.add(second, time.monotonic())
+        return
+    
+    if host.id not in bot.locks:
+        bot.locks[host.id] = asyncio.Lock()
+    
+    async with bot.locks[host.id]:
+        embed = create_embed(
+            "⚔️ Match Found!",
+            f"**{p1.mention} (X)** `{first.rating}` vs **{p2.mention} (O)** `{second.rating}`\n"
+            f"{p1.mention} goes first! Use `/move row col` to play (1-3)",
+            0x9b59b6
+        )
+        try:
+            await start_game(host.id, host.send, p1, p2, None, embed, mirrors)
+        except discord.HTTPException as e:
+            # Usually a player with DMs closed - drop the half-started game
+            print(f"⚠️ Error starting queue match in {host.id}: {e}")
+            game = bot.games.get(host.id)
+            if game:
+                end_game(host.id)
+            if not mirrors:
+                for entry in (first, second):
+                    await notify_queue_entry(entry, "Match Failed", f"{entry.user.mention} the game couldn't be started, try `/queue` again")
+                return
+            
+            # The host DM is sent first, so a game without a message means p1's DMs failed
+            at_fault, other = (first, second) if game is None or game.message_id is None else (second, first)
+            await notify_queue_entry(at_fault, "Match Failed", f"{at_fault.user.mention} I couldn't DM you - open your DMs to play cross-server games")
+            bot.queue.add(other, time.monotonic())
+            await notify_queue_entry(other, "Match Failed", f"{other.user.mention} your opponent couldn't be reached, you're back in the queue")
+            return
+    
+    bot.queue.record_match(first, second, time.monotonic())
+
+async def start_ai_fallback(entry):
+    """Give a player who waited too long a game against an AI of similar strength"""
+    channel = bot.get_channel(entry.channel_id)
+    if not channel:
+        return
+    if channel.id in bot.games:
+        return await channel.send(embed=create_embed(
+            "No Opponent Found",
+            f"{entry.user.mention} nobody was found in time, try `/queue` again later",
+            0x95a5a6
+        ))
+    
+    if channel.id not in bot.locks:
+        bot.locks[channel.id] = asyncio.Lock()
+    
+    async with bot.locks[channel.id]:
+        difficulty = ai_level_for_rating(entry.rating, level_loss_rates())
+        embed = create_embed(
+            "🎮 No Opponent Found - Playing AI!",
+            f"**{entry.user.mention} (X)** vs **AI: {difficulty.capitalize()} 🤖 (O)**\n"
+            f"AI goes first! 🤖",
+            0x9b59b6
+        )
+        await start_game(channel.id, channel.send, entry.user, "AI", difficulty, embed)
+
+async def queue_sweeper():
+    """Retry matches as search windows widen, fall back to AI and expire stale entries"""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        matches, fallbacks, timed_out = bot.queue.sweep(time.monotonic())
+        for first, second in matches:
+            try:
+                await start_queue_match(first, second)
+            except Exception as e:
+                print(f"⚠️ Error starting queue match: {e}")
+        for entry in fallbacks:
+            try:
+                await start_ai_fallback(entry)
+            except Exception as e:
+                print(f"⚠️ Error starting AI fallback: {e}")
+        for entry in timed_out:
+            channel = bot.get_channel(entry.channel_id)
+            if channel:
+                try:
+                    await channel.send(embed=create_embed(
+                        "Queue Timed Out",
+                        f"{entry.user.mention} no opponent was found, try `/queue` again later",
+                        0x95a5a6
+                    ))
+                except:
+                    pass
+        await asyncio.sleep(QUEUE_SWEEP_INTERVAL)
+
+@bot.hybrid_command(name="queue", description="Find an opponent with a similar rating")
+@app_commands.describe(
+    cross_guild="Also match players from other servers (played in DMs)",
+    ai_fallback="Play an AI if nobody is found within a minute"
+)
+async def queue(ctx, cross_guild: bool = False, ai_fallback: bool = True):
+    if not ctx.guild:
+        return await ctx.send(embed=create_embed(
+            "Server Only",
+            "Use `/queue` in a server channel",
+            0xe74c3c
+        ))
+    
+    if ctx.author.bot:
+        return await ctx.send(embed=create_embed(
+            "Invalid Player",
+            "Bots can't join the queue!",
+            0xe74c3c
+        ))
+    
+    if any(ctx.author in game.players for game in bot.games.values()):
+        return await ctx.send(embed=create_embed(
+            "Already Playing",
+            "Finish or `/cancel` your current game before joining the queue",
+            0xe74c3c
+        ))
+    
+    if ctx.author.id in bot.queue:
+        return await ctx.send(embed=create_embed(
+            "Already Queued",
+            "You're already searching for a game! Use `/leavequeue` to stop",
+            0xe74c3c
+        ))
+    
+    now = time.monotonic()
+    entry = QueueEntry(ctx.author, get_rating(ctx.author.id), ctx.guild.id,
+                       ctx.channel.id, now, cross_guild, ai_fallback)
+    match = bot.queue.find_match(entry, now)
+    if match is None:
+        bot.queue.add(entry)
+        return await ctx.send(embed=create_embed(
+            "🔎 Searching for an Opponent",
+            f"{ctx.author.mention} joined the queue with rating `{entry.rating}`\n"
+            f"Players waiting: **{len(bot.queue)}**",
+            0x3498db
+        ))
+    
+    bot.queue.remove(match.user.id)
+    await ctx.send(embed=create_embed(
+        "⚔️ Match Found!",
+        f"{ctx.author.mention} vs {match.user.mention} - setting up the game...",
+        0x2ecc71
+    ))
+    await start_queue_match(match, entry)
+
+@bot.hybrid_command(name="leavequeue", description="Stop searching for an opponent")
+async def leavequeue(ctx):
+    if bot.queue.remove(ctx.author.id) is None:
+        return await ctx.send(embed=create_embed(
+            "Not Queued",
+            "You're not in the matchmaking queue",
+            0x95a5a6
+        ))
+    await ctx.send(embed=create_embed(
+        "Left Queue",
+        "You've stopped searching for an opponent",
+        0x95a5a6
+    ))
+
+@bot.hybrid_command(name="queuestats", description="Show matchmaking queue statistics")
+async def queuestats(ctx):
+    stats = bot.queue.stats()
+    embed = create_embed(
+        "📊 Matchmaking Stats",
+        f"Players waiting: **{stats['waiting']}**\n"
+        f"Matches: **{stats['matches']}** | AI fallbacks: **{stats['ai_fallbacks']}** | "
+        f"Timeouts: **{stats['timeouts']}**",
+        0x9b59b6
+    )
+    embed.add_field(
+        name="Time to Match",
+        value=(f"avg `{stats['avg_wait']:.1f}s` | p50 `{stats['p50_wait']:.1f}s` | "
+               f"p90 `{stats['p90_wait']:.1f}s` | max `{stats['max_wait']:.1f}s`"),
+        inline=False
+    )
+    await ctx.send(embed=embed)
+
+@bot.hybrid_command(name="cachestats", description="Show board image cache statistics")
+async def cachestats(ctx):
+    if not IMAGE_CHANNEL_ID:
+        return await ctx.send(embed=create_embed(
+            "Image Cache Disabled",
+            "Set `IMAGE_CHANNEL_ID` in `.env` to reuse uploaded board images",
+            0x95a5a6
+        ))
+    
+    stats = bot.image_cache.stats()
+    await ctx.send(embed=create_embed(
+        "🖼️ Image Cache Stats",
+        f"Cached boards: **{stats['entries']}**\n"
+        f"Hit rate: **{stats['hit_rate']:.1%}** ({stats['hits']} hits / {stats['misses']} misses)\n"
+        f"URL refreshes: **{stats['refreshes']}**\n"
+        f"Uploaded: **{stats['bytes_uploaded'] / 1024:.1f} KB** | Saved: **{stats['bytes_saved'] / 1024:.1f} KB**",
+        0x9b59b6
+    ))
+
 @bot.hybrid_command(name="commands", description="Show available commands")
 async def show_commands(ctx):
     """Show help information"""
@@ -691,6 +1003,12 @@ async def show_commands(ctx):
         ("`/tictactoe easy`", "Play against Easy AI"),
         ("`/tictactoe medium`", "Play against Medium AI"),
         ("`/tictactoe hard`", "Play against Hard AI"),
+        *[(f"`/tictactoe {level}`", f"Play against {level.capitalize()} AI (calibrated)")
+          for level in custom_levels],
+        ("`/queue`", "Find an opponent with a similar rating"),
+        ("`/leavequeue`", "Stop searching for an opponent"),
+        ("`/queuestats`", "Show matchmaking statistics"),
+        ("`/cachestats`", "Show board image cache statistics"),
         ("`/move <row> <col>`", "Make your move (1-3 for both)"),
         ("`/cancel`", "Cancel the current game"),
         ("`/commands`", "Show this help message"),
@@ -0,0 +1,206 @@
+import os
+import json
+import random
+import math
+
+# Built-in AI levels; tunable levels are added from difficulties.json
+BASE_LEVELS = ["easy", "medium", "hard"]
+# How often perfect play beats each built-in level, on the same scale as the
+# measured_loss_rate of calibrated levels. Easy and hard are from selfplay.py
+# runs. Medium is hand-tuned: it measures 0.0 because it draws every game
+# against deterministic minimax, but it misses forks a human finds, so it is
+# placed just above hard to keep the two apart when picking a level by rating.
+# Calibrated levels are measured, so one near 0.05 may rank either side of it.
+BASE_LEVEL_LOSS_RATES = {"easy": 0.9, "medium": 0.05, "hard": 0.0}
+
+# Filled at startup from the files written by selfplay.py
+opening_book = {}   # board_key -> (row, col) for the hard AI
+custom_levels = {}  # level name -> {"perfect_rate": float, ...}
+
+# Unified win check function
+def check_board_win(board):
+    # Check rows
+    for row in board:
+        if row[0] == row[1] == row[2] != "":
+            return row[0]
+    # Check columns
+    for col in range(3):
+        if board[0][col] == board[1][col] == board[2][col] != "":
+            return board[0][col]
+    # Check diagonals
+    if board[0][0] == board[1][1] == board[2][2] != "":
+        return board[0][0]
+    if board[0][2] == board[1][1] == board[2][0] != "":
+        return board[0][2]
+    # Check for draw
+    if all(cell != "" for row in board for cell in row):
+        return "Draw"
+    return None
+
+def board_key(board, mark):
+    """Encode a board from the side to move's view: mover is X, opponent O, empty ."""
+    key = []
+    for row in board:
+        for cell in row:
+            if cell == "":
+                key.append(".")
+            else:
+                key.append("X" if cell == mark else "O")
+    return "".join(key)
+
+# AI Logic
+def get_empty_cells(board):
+    return [(r, c) for r in range(3) for c in range(3) if board[r][c] == ""]
+
+def get_random_move(board):
+    empty = get_empty_cells(board)
+    return random.choice(empty) if empty else (0, 0)
+
+def get_medium_move(board, ai_mark):
+    # Try to win if possible
+    for r, c in get_empty_cells(board):
+        board[r][c] = ai_mark
+        if check_board_win(board) == ai_mark:
+            board[r][c] = ""
+            return r, c
+        board[r][c] = ""
+
+    # Block opponent win
+    opponent_mark = "O" if ai_mark == "X" else "X"
+    for r, c in get_empty_cells(board):
+        board[r][c] = opponent_mark
+        if check_board_win(board) == opponent_mark:
+            board[r][c] = ""
+            return r, c
+        board[r][c] = ""
+
+    # Strategic moves
+    if board[1][1] == "":  # Center is best
+        return 1, 1
+
+    # Take a corner if available
+    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
+    empty_corners = [c for c in corners if board[c[0]][c[1]] == ""]
+    if empty_corners:
+        return random.choice(empty_corners)
+
+    # Otherwise random
+    return get_random_move(board)
+
+def minimax(board, depth, is_maximizing, ai_mark, alpha=-math.inf, beta=math.inf):
+    opponent_mark = "O" if ai_mark == "X" else "X"
+
+    # Check game state
+    result = check_board_win(board)
+    if result == ai_mark:
+        return 10 - depth
+    elif result == opponent_mark:
+        return depth - 10
+    elif result == "Draw":
+        return 0
+
+    if is_maximizing:
+        best_score = -math.inf
+        for r, c in get_empty_cells(board):
+            board[r][c] = ai_mark
+            score = minimax(board, depth + 1, False, ai_mark, alpha, beta)
+            board[r][c] = ""
+            best_score = max(score, best_score)
+            alpha = max(alpha, best_score)
+            if beta <= alpha:
+                break
+        return best_score
+    else:
+        best_score = math.inf
+        for r, c in get_empty_cells(board):
+            board[r][c] = opponent_mark
+            score = minimax(board, depth + 1, True, ai_mark, alpha, beta)
+            board[r][c] = ""
+            best_score = min(score, best_score)
+            beta = min(beta, best_score)
+            if beta <= alpha:
+                break
+        return best_score
+
+def search_hard_move(board, ai_mark):
+    """Full minimax search, ignoring the opening book"""
+    best_score = -math.inf
+    best_move = None
+
+    for r, c in get_empty_cells(board):
+        board[r][c] = ai_mark
+        score = minimax(board, 0, False, ai_mark)
+        board[r][c] = ""
+
+        if score > best_score:
+            best_score = score
+            best_move = (r, c)
+
+    return best_move
+
+def get_hard_move(board, ai_mark):
+    # Opening positions are precomputed, so skip the expensive early searches
+    book_move = opening_book.get(board_key(board, ai_mark))
+    if book_move is not None:
+        return book_move
+    return search_hard_move(board, ai_mark)
+
+def get_tunable_move(board, ai_mark, perfect_rate):
+    """Play perfectly with probability perfect_rate, otherwise randomly"""
+    if random.random() < perfect_rate:
+        return get_hard_move(board, ai_mark)
+    return get_random_move(board)
+
+def choose_move(board, ai_mark, difficulty):
+    """Pick a move for the given AI level"""
+    if difficulty == "easy":
+        return get_random_move(board)
+    elif difficulty == "medium":
+        return get_medium_move(board, ai_mark)
+    elif difficulty == "hard":
+        return get_hard_move(board, ai_mark)
+    elif difficulty in custom_levels:
+        return get_tunable_move(board, ai_mark, custom_levels[difficulty]["perfect_rate"])
+
+    return get_random_move(board)
+
+def ai_levels():
+    """All AI levels a game can be started with"""
+    return BASE_LEVELS + [name for name in custom_levels if name not in BASE_LEVELS]
+
+def level_loss_rates():
+    """Every AI level with how often perfect play beats it, weakest levels highest"""
+    rates = dict(BASE_LEVEL_LOSS_RATES)
+    for name, level in custom_levels.items():
+        rate = level.get("measured_loss_rate", level.get("target_loss_rate"))
+        if isinstance(rate, (int, float)) and not isinstance(rate, bool):
+            rates[name] = rate
+    return rates
+
+def load_opening_book(path):
+    """Load an opening book written by selfplay.py, returns number of positions"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    opening_book.clear()
+    opening_book.update({key: tuple(move) for key, move in data.items()})
+    return len(opening_book)
+
+def load_difficulties(path):
+    """Load calibrated difficulty levels written by selfplay.py, returns number of levels"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    custom_levels.clear()
+    for name, level in data.items():
+        name = name.lower()
+        rate = level.get("perfect_rate") if isinstance(level, dict) else None
+        if name in BASE_LEVELS or not name.isalnum():
+            print(f"⚠️ Skipping difficulty level with invalid name: {name}")
+        elif isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+            print(f"⚠️ Skipping difficulty level {name}: perfect_rate must be a number between 0 and 1")
+        else:
+            custom_levels[name] = level
+    return len(custom_levels)
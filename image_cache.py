@@ -0,0 +1,133 @@
+import os
+import json
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+MAX_ENTRIES = 10000
+REFRESH_MARGIN = 3600      # re-sign URLs this many seconds before they expire
+UNSIGNED_TTL = 24 * 3600   # assumed lifetime of URLs without an ex= parameter
+
+def board_cache_key(board, colors):
+    """Everything a rendered board image depends on"""
+    cells = "".join(cell or "." for row in board for cell in row)
+    return f"{cells}|{colors[0]}|{colors[1]}"
+
+def url_expiry(url, now):
+    """Expiry of a signed Discord CDN URL, read from its hex ex= timestamp"""
+    ex = parse_qs(urlparse(url).query).get("ex")
+    if ex:
+        try:
+            return int(ex[0], 16)
+        except ValueError:
+            pass
+    return now + UNSIGNED_TTL
+
+class CachedImage:
+    def __init__(self, url, message_id, size, now):
+        self.message_id = message_id  # Message holding the attachment, for re-signing
+        self.size = size
+        self.refresh(url, now)
+
+    def refresh(self, url, now):
+        self.url = url
+        self.expires_at = url_expiry(url, now)
+
+    def is_fresh(self, now):
+        return now < self.expires_at - REFRESH_MARGIN
+
+class ImageCache:
+    """LRU map of board_cache_key -> CachedImage, with hit-rate counters"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.bytes_saved = 0
+        self.bytes_uploaded = 0
+        self.dirty = False  # Changed since the last save
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """Cache an uploaded image, returns the entries it replaced or evicted to make room"""
+        replaced = self.entries.get(key)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.dirty = True
+        # Two uploads of the same board can race, the older copy is dropped like an evicted one
+        evicted = [replaced] if replaced is not None and replaced is not entry else []
+        while len(self.entries) > self.max_entries:
+            evicted.append(self.entries.popitem(last=False)[1])
+        return evicted
+
+    def discard(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+    def record_hit(self, entry):
+        self.hits += 1
+        self.bytes_saved += entry.size
+        self.dirty = True
+
+    def record_miss(self, size):
+        self.misses += 1
+        self.bytes_uploaded += size
+        self.dirty = True
+
+    def record_refresh(self):
+        self.refreshes += 1
+        self.dirty = True
+
+    def save(self, path):
+        """Write entries (least recently used first) and counters to a JSON file"""
+        data = {
+            "entries": {key: [e.message_id, e.url, e.size] for key, e in self.entries.items()},
+            "counters": {name: getattr(self, name) for name in
+                         ("hits", "misses", "refreshes", "bytes_saved", "bytes_uploaded")}
+        }
+        # Write then rename so a crash never leaves a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    def load(self, path, now):
+        """Restore a cache written by save, returns number of entries"""
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.entries.clear()
+        for key, (message_id, url, size) in data.get("entries", {}).items():
+            self.entries[key] = CachedImage(url, message_id, size, now)
+        for name, value in data.get("counters", {}).items():
+            if name in ("hits", "misses", "refreshes", "bytes_saved", "bytes_uploaded"):
+                setattr(self, name, value)
+        # Only happens if max_entries was lowered since the file was saved
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.dirty = False
+        return len(self.entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "bytes_saved": self.bytes_saved,
+            "bytes_uploaded": self.bytes_uploaded
+        }
@@ -0,0 +1,251 @@
+import os
+import json
+import bisect
+import heapq
+import itertools
+from collections import deque
+
+# Ratings
+DEFAULT_RATING = 1000
+K_FACTOR = 32
+
+# Queue tuning (seconds / rating points)
+BASE_WINDOW = 100     # rating difference accepted straight away
+WINDOW_STEP = 50      # extra rating difference accepted ...
+WINDOW_INTERVAL = 10  # ... every this many seconds waited
+MAX_WINDOW = 400
+SWEEP_BATCH = 2000    # most widened entries retried per sweep
+
+CROSS_GUILD = "cross"  # pool of players open to other servers
+
+def update_ratings(rating_a, rating_b, score_a):
+    """Elo update, score_a is 1 for a win, 0.5 for a draw, 0 for a loss"""
+    expected_a = 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+    change = K_FACTOR * (score_a - expected_a)
+    return round(rating_a + change), round(rating_b - change)
+
+def load_ratings(path):
+    """Ratings saved by save_ratings as user_id -> rating"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {int(user_id): rating for user_id, rating in data.items()
+            if user_id.isdigit() and isinstance(rating, int)}
+
+def save_ratings(path, ratings):
+    # Write then rename so a crash never leaves a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({str(user_id): rating for user_id, rating in ratings.items()}, f)
+    os.replace(tmp_path, path)
+
+def ai_level_for_rating(rating, loss_rates):
+    """AI level offered to a player nobody was matched with
+
+    loss_rates maps each level to how often perfect play beats it; a default
+    rated player gets a level that loses 40% of the time, 500 points more
+    gets a perfect one.
+    """
+    target = min(1.0, max(0.0, 0.4 - (rating - DEFAULT_RATING) / 500))
+    return min(loss_rates, key=lambda level: abs(loss_rates[level] - target))
+
+class QueueEntry:
+    def __init__(self, user, rating, guild_id, channel_id, joined_at,
+                 cross_guild=False, ai_fallback=True):
+        self.user = user
+        self.rating = rating
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.joined_at = joined_at
+        self.cross_guild = cross_guild
+        self.ai_fallback = ai_fallback
+
+    def widenings(self, now):
+        """How many times this player's window has widened so far"""
+        return min((MAX_WINDOW - BASE_WINDOW) // WINDOW_STEP,
+                   max(0, int((now - self.joined_at) // WINDOW_INTERVAL)))
+
+    def window(self, now):
+        """Rating difference this player accepts, widening the longer they wait"""
+        return BASE_WINDOW + WINDOW_STEP * self.widenings(now)
+
+    def can_play(self, other, now):
+        if self.user.id == other.user.id:
+            return False
+        if self.guild_id != other.guild_id and not (self.cross_guild and other.cross_guild):
+            return False
+        return abs(self.rating - other.rating) <= max(self.window(now), other.window(now))
+
+class RatingIndex:
+    """Players of one pool in buckets of equal rating, with a sorted list of non-empty ratings"""
+
+    def __init__(self):
+        self.buckets = {}  # rating -> {user_id: QueueEntry}, oldest first
+        self.ratings = []
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def add(self, entry):
+        if entry.rating not in self.buckets:
+            self.buckets[entry.rating] = {}
+            bisect.insort(self.ratings, entry.rating)
+        self.buckets[entry.rating][entry.user.id] = entry
+
+    def remove(self, entry):
+        bucket = self.buckets[entry.rating]
+        del bucket[entry.user.id]
+        if not bucket:
+            del self.buckets[entry.rating]
+            del self.ratings[bisect.bisect_left(self.ratings, entry.rating)]
+
+    def _oldest(self, index, entry):
+        for other in self.buckets[self.ratings[index]].values():
+            if other is not entry:
+                return other
+        return None
+
+    def neighbours(self, entry):
+        """Oldest player at the closest rating on each side of entry"""
+        found = []
+        i = bisect.bisect_left(self.ratings, entry.rating)
+        if i > 0:
+            found.append(self._oldest(i - 1, entry))
+        for j in range(i, min(i + 2, len(self.ratings))):
+            other = self._oldest(j, entry)
+            if other is not None:
+                found.append(other)
+                break
+        return found
+
+class MatchQueue:
+    """Waiting players indexed by rating, one index per server plus one for cross-server play
+
+    Lookups only see compatible players, so they cost a bisect. Deadlines and
+    window widenings are kept in heaps, so a sweep only touches entries that
+    are due.
+    """
+
+    def __init__(self, timeout, ai_fallback_after):
+        self.timeout = timeout
+        self.ai_fallback_after = ai_fallback_after
+        self.entries = {}     # user_id -> QueueEntry
+        self.pools = {}       # guild_id or CROSS_GUILD -> RatingIndex
+        self.deadlines = []   # heap of (time, seq, entry) for AI fallback / timeout
+        self.widenings = []   # heap of (time, seq, entry) when the next window step starts
+        self._seq = itertools.count()
+        # Metrics
+        self.wait_times = deque(maxlen=1000)
+        self.matches = 0
+        self.ai_fallbacks = 0
+        self.timeouts = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, user_id):
+        return user_id in self.entries
+
+    def _pool_keys(self, entry):
+        return [entry.guild_id, CROSS_GUILD] if entry.cross_guild else [entry.guild_id]
+
+    def _schedule_widening(self, entry, now):
+        step = entry.widenings(now)
+        if BASE_WINDOW + WINDOW_STEP * step < MAX_WINDOW:
+            when = entry.joined_at + WINDOW_INTERVAL * (step + 1)
+            heapq.heappush(self.widenings, (when, next(self._seq), entry))
+
+    def add(self, entry, now=None):
+        now = entry.joined_at if now is None else now
+        self.entries[entry.user.id] = entry
+        for key in self._pool_keys(entry):
+            self.pools.setdefault(key, RatingIndex()).add(entry)
+        wait = self.ai_fallback_after if entry.ai_fallback else self.timeout
+        heapq.heappush(self.deadlines, (entry.joined_at + wait, next(self._seq), entry))
+        self._schedule_widening(entry, now)
+
+    def remove(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry is None:
+            return None
+        for key in self._pool_keys(entry):
+            pool = self.pools[key]
+            pool.remove(entry)
+            if not pool:
+                del self.pools[key]
+        return entry  # Its heap items are skipped lazily
+
+    def _queued(self, entry):
+        return self.entries.get(entry.user.id) is entry
+
+    def find_match(self, entry, now):
+        """Closest-rated compatible waiting player that can play entry, oldest first on ties"""
+        best = None
+        for key in self._pool_keys(entry):
+            pool = self.pools.get(key)
+            if pool is None:
+                continue
+            for other in pool.neighbours(entry):
+                if not entry.can_play(other, now):
+                    continue
+                if best is None or (abs(other.rating - entry.rating), other.joined_at) < \
+                        (abs(best.rating - entry.rating), best.joined_at):
+                    best = other
+        return best
+
+    def record_match(self, first, second, now):
+        self.matches += 1
+        self.wait_times.append(now - first.joined_at)
+        self.wait_times.append(now - second.joined_at)
+
+    def sweep(self, now, batch=SWEEP_BATCH):
+        """Pull out players who waited too long and retry those whose window widened
+
+        Returns (matches, ai_fallbacks, timed_out); matched players are removed
+        from the queue and passed back as (first, second) by join time. At most
+        `batch` widened entries are retried, the rest wait for the next sweep.
+        """
+        matches, fallbacks, timed_out = [], [], []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, _, entry = heapq.heappop(self.deadlines)
+            if not self._queued(entry):
+                continue  # Already matched, left or re-queued
+            self.remove(entry.user.id)
+            if entry.ai_fallback:
+                fallbacks.append(entry)
+                self.ai_fallbacks += 1
+            else:
+                timed_out.append(entry)
+                self.timeouts += 1
+
+        retried = 0
+        while self.widenings and self.widenings[0][0] <= now and retried < batch:
+            _, _, entry = heapq.heappop(self.widenings)
+            if not self._queued(entry):
+                continue
+            retried += 1
+            other = self.find_match(entry, now)
+            if other is None:
+                self._schedule_widening(entry, now)
+            else:
+                self.remove(entry.user.id)
+                self.remove(other.user.id)
+                matches.append(tuple(sorted((entry, other), key=lambda e: e.joined_at)))
+        return matches, fallbacks, timed_out
+
+    def stats(self):
+        """Time-to-match summary in seconds"""
+        waits = sorted(self.wait_times)
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(len(waits) * p))] if waits else 0.0
+        return {
+            "waiting": len(self.entries),
+            "matches": self.matches,
+            "ai_fallbacks": self.ai_fallbacks,
+            "timeouts": self.timeouts,
+            "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+            "p50_wait": percentile(0.5),
+            "p90_wait": percentile(0.9),
+            "max_wait": waits[-1] if waits else 0.0
+        }
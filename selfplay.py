@@ -0,0 +1,300 @@
+"""Offline self-play for the Tic Tac Toe AI.
+
+Runs AI-vs-AI games across a multiprocessing pool, streams every game to a
+compact binary results file and turns the results into win/draw tables, an
+opening book and calibrated difficulty levels that bot.py loads at startup.
+
+Usage:
+    python selfplay.py run --games 1000000 --workers 8
+    python selfplay.py report
+    python selfplay.py book --plies 4
+    python selfplay.py calibrate beginner=0.8 casual=0.4 tricky=0.1
+"""
+import os
+import sys
+import json
+import struct
+import random
+import argparse
+from multiprocessing import Pool, cpu_count
+
+from game_logic import (
+    BASE_LEVELS, check_board_win, board_key, search_hard_move,
+    get_random_move, choose_move, load_difficulties, custom_levels
+)
+
+RESULTS_PATH = "selfplay.bin"
+OPENING_BOOK_PATH = "opening_book.json"
+DIFFICULTIES_PATH = "difficulties.json"
+
+# Results file: MAGIC, uint16 length + JSON list of level names, then records
+MAGIC = b"TTTSELF1"
+# x level index, o level index, outcome, up to 9 moves as cell index (0xFF = none)
+RECORD = struct.Struct("<BBB9s")
+NO_MOVE = 0xFF
+DRAW, X_WINS, O_WINS = 0, 1, 2
+
+# Per-process cache of perfect moves, keyed by board_key
+_perfect_moves = {}
+
+def perfect_move(board, mark):
+    key = board_key(board, mark)
+    move = _perfect_moves.get(key)
+    if move is None:
+        move = _perfect_moves[key] = search_hard_move(board, mark)
+    return move
+
+def pick_move(board, mark, player):
+    """player is (level name, perfect_rate) - perfect_rate is None for built-in levels"""
+    name, perfect_rate = player
+    if perfect_rate is not None:
+        if random.random() < perfect_rate:
+            return perfect_move(board, mark)
+        return get_random_move(board)
+    if name == "hard":
+        return perfect_move(board, mark)
+    return choose_move(board, mark, name)
+
+def play_game(x_player, o_player):
+    """Play one game with X moving first, returns (outcome, list of cell indexes)"""
+    board = [["" for _ in range(3)] for _ in range(3)]
+    players = (x_player, o_player)
+    moves = []
+    result = None
+    while result is None:
+        mark = "X" if len(moves) % 2 == 0 else "O"
+        r, c = pick_move(board, mark, players[len(moves) % 2])
+        board[r][c] = mark
+        moves.append(r * 3 + c)
+        result = check_board_win(board)
+
+    if result == "Draw":
+        return DRAW, moves
+    return (X_WINS if result == "X" else O_WINS), moves
+
+def run_chunk(task):
+    """Pool worker: play a batch of games for one pairing"""
+    x_idx, o_idx, x_player, o_player, games, seed, keep_records = task
+    random.seed(seed)
+    counts = [0, 0, 0]
+    records = bytearray()
+    for _ in range(games):
+        outcome, moves = play_game(x_player, o_player)
+        counts[outcome] += 1
+        if keep_records:
+            records += RECORD.pack(x_idx, o_idx, outcome,
+                                   bytes(moves).ljust(9, bytes([NO_MOVE])))
+    return x_idx, o_idx, counts, bytes(records)
+
+def make_tasks(pairings, games_per_pairing, chunk_size, rng, keep_records):
+    tasks = []
+    for x_idx, o_idx, x_player, o_player in pairings:
+        remaining = games_per_pairing
+        while remaining > 0:
+            games = min(chunk_size, remaining)
+            tasks.append((x_idx, o_idx, x_player, o_player, games,
+                          rng.getrandbits(64), keep_records))
+            remaining -= games
+    return tasks
+
+def write_header(f, levels):
+    names = json.dumps(levels).encode("utf-8")
+    f.write(MAGIC)
+    f.write(struct.pack("<H", len(names)))
+    f.write(names)
+
+def read_results(path, batch=65536):
+    """Yield (levels, (x_idx, o_idx, outcome, moves)) for every stored game"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a self-play results file")
+        (length,) = struct.unpack("<H", f.read(2))
+        levels = json.loads(f.read(length).decode("utf-8"))
+        while True:
+            data = f.read(RECORD.size * batch)
+            if not data:
+                break
+            partial = len(data) % RECORD.size
+            if partial:
+                # Only the last read can be short, e.g. from an interrupted run
+                print(f"⚠️ Ignoring {partial} trailing bytes of a partial record in {path}", file=sys.stderr)
+                data = data[:-partial]
+            for x_idx, o_idx, outcome, moves in RECORD.iter_unpack(data):
+                yield levels, (x_idx, o_idx, outcome, [m for m in moves if m != NO_MOVE])
+
+def print_table(levels, counts):
+    print(f"{'X (first)':>12} {'O (second)':>12} {'games':>10} {'X win':>8} {'O win':>8} {'draw':>8}")
+    for (x_idx, o_idx), (draws, x_wins, o_wins) in sorted(counts.items()):
+        total = draws + x_wins + o_wins
+        print(f"{levels[x_idx]:>12} {levels[o_idx]:>12} {total:>10} "
+              f"{x_wins / total:>8.1%} {o_wins / total:>8.1%} {draws / total:>8.1%}")
+
+def cmd_run(args):
+    load_difficulties(args.difficulties)
+    levels = args.levels or (BASE_LEVELS + list(custom_levels))
+    for level in levels:
+        if level not in BASE_LEVELS and level not in custom_levels:
+            sys.exit(f"❌ Unknown level: {level}")
+    if len(levels) >= NO_MOVE:
+        sys.exit("❌ Too many levels")
+
+    players = [(level, custom_levels[level]["perfect_rate"] if level in custom_levels else None)
+               for level in levels]
+    pairings = [(x, o, players[x], players[o]) for x in range(len(levels)) for o in range(len(levels))]
+    games_per_pairing = max(1, args.games // len(pairings))
+    tasks = make_tasks(pairings, games_per_pairing, args.chunk, random.Random(args.seed), True)
+
+    counts = {}
+    done = 0
+    total = games_per_pairing * len(pairings)
+    with open(args.out, "wb") as f, Pool(args.workers) as pool:
+        write_header(f, levels)
+        for x_idx, o_idx, chunk_counts, records in pool.imap_unordered(run_chunk, tasks):
+            f.write(records)
+            pair = counts.setdefault((x_idx, o_idx), [0, 0, 0])
+            for i in range(3):
+                pair[i] += chunk_counts[i]
+            done += sum(chunk_counts)
+            print(f"\r🎲 {done}/{total} games", end="", flush=True)
+    print(f"\n✅ Results written to {args.out}")
+    print_table(levels, counts)
+
+def cmd_report(args):
+    levels = []
+    counts = {}
+    for levels, (x_idx, o_idx, outcome, _) in read_results(args.results):
+        counts.setdefault((x_idx, o_idx), [0, 0, 0])[outcome] += 1
+    if not counts:
+        sys.exit(f"❌ No games in {args.results}")
+    print_table(levels, counts)
+
+def cmd_book(args):
+    """Build an opening book of perfect moves for positions reached in self-play"""
+    seen = {}
+    for _, (_, _, _, moves) in read_results(args.results):
+        board = [["" for _ in range(3)] for _ in range(3)]
+        for ply, cell in enumerate(moves[:args.plies]):
+            mark = "X" if ply % 2 == 0 else "O"
+            key = board_key(board, mark)
+            if key not in seen:
+                seen[key] = [0, [row[:] for row in board], mark]
+            seen[key][0] += 1
+            board[cell // 3][cell % 3] = mark
+
+    book = {}
+    for key, (count, board, mark) in sorted(seen.items()):
+        if count >= args.min_count:
+            book[key] = list(perfect_move(board, mark))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(book, f, indent=1, sort_keys=True)
+    print(f"📖 Wrote {len(book)} positions to {args.out}")
+
+def measure_loss_rate(pool, perfect_rate, games, chunk_size, rng):
+    """Fraction of games a tunable level loses against perfect play, both seats"""
+    level = ("tunable", perfect_rate)
+    perfect = ("hard", None)
+    pairings = [(0, 1, level, perfect), (1, 0, perfect, level)]
+    tasks = make_tasks(pairings, games // 2, chunk_size, rng, False)
+    losses = total = 0
+    for x_idx, _, (draws, x_wins, o_wins), _ in pool.imap_unordered(run_chunk, tasks):
+        losses += o_wins if x_idx == 0 else x_wins
+        total += draws + x_wins + o_wins
+    return losses / total
+
+def cmd_calibrate(args):
+    """Find perfect_rate for each level so that perfect play beats it at the target rate"""
+    targets = {}
+    for spec in args.levels:
+        name, _, target = spec.partition("=")
+        name = name.lower()
+        if not name.isalnum() or name in BASE_LEVELS:
+            sys.exit(f"❌ Invalid level name: {name}")
+        try:
+            targets[name] = float(target)
+        except ValueError:
+            sys.exit(f"❌ Invalid target for {name}: {target}")
+        if not 0 <= targets[name] <= 1:
+            sys.exit(f"❌ Target for {name} must be between 0 and 1")
+
+    if args.games < 2:
+        sys.exit("❌ --games must be at least 2 (one game per seat)")
+    if args.iterations < 1:
+        sys.exit("❌ --iterations must be at least 1")
+
+    levels = {}
+    if os.path.exists(args.out):
+        with open(args.out, encoding="utf-8") as f:
+            levels = json.load(f)
+
+    rng = random.Random(args.seed)
+    with Pool(args.workers) as pool:
+        for name, target in targets.items():
+            # More perfect moves means fewer losses, so bisect on perfect_rate,
+            # keeping whichever tested rate came closest to the target
+            low, high = 0.0, 1.0
+            rate = loss = None
+            for _ in range(args.iterations):
+                mid = (low + high) / 2
+                mid_loss = measure_loss_rate(pool, mid, args.games, args.chunk, rng)
+                if loss is None or abs(mid_loss - target) < abs(loss - target):
+                    rate, loss = mid, mid_loss
+                if mid_loss > target:
+                    low = mid
+                else:
+                    high = mid
+            levels[name] = {
+                "target_loss_rate": target,
+                "perfect_rate": round(rate, 4),
+                "measured_loss_rate": round(loss, 4)
+            }
+            print(f"🎯 {name}: perfect_rate={rate:.4f} loses {loss:.1%} vs perfect play (target {target:.1%})")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(levels, f, indent=2, sort_keys=True)
+    print(f"✅ Difficulty levels written to {args.out}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tic Tac Toe AI self-play tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Play AI-vs-AI games for every level pairing")
+    run.add_argument("--games", type=int, default=1_000_000, help="Total games across all pairings")
+    run.add_argument("--levels", nargs="+", help="Levels to pair (default: all)")
+    run.add_argument("--out", default=RESULTS_PATH)
+    run.add_argument("--difficulties", default=DIFFICULTIES_PATH)
+    run.set_defaults(func=cmd_run)
+
+    report = sub.add_parser("report", help="Win/draw rates per pairing from a results file")
+    report.add_argument("--results", default=RESULTS_PATH)
+    report.set_defaults(func=cmd_report)
+
+    book = sub.add_parser("book", help="Build the opening book from a results file")
+    book.add_argument("--results", default=RESULTS_PATH)
+    book.add_argument("--plies", type=int, default=4, help="Opening depth to cover")
+    book.add_argument("--min-count", type=int, default=1, help="Minimum times a position was reached")
+    book.add_argument("--out", default=OPENING_BOOK_PATH)
+    book.set_defaults(func=cmd_book)
+
+    calibrate = sub.add_parser("calibrate", help="Define levels by how often perfect play beats them")
+    calibrate.add_argument("levels", nargs="+", metavar="NAME=LOSS_RATE")
+    calibrate.add_argument("--games", type=int, default=20_000, help="Games per bisection step")
+    calibrate.add_argument("--iterations", type=int, default=10)
+    calibrate.add_argument("--out", default=DIFFICULTIES_PATH)
+    calibrate.set_defaults(func=cmd_calibrate)
+
+    for p in (run, calibrate):
+        p.add_argument("--workers", type=int, default=cpu_count())
+        p.add_argument("--chunk", type=int, default=5_000, help="Games per worker task")
+        p.add_argument("--seed", type=int)
+
+    args = parser.parse_args()
+    if args.command in ("run", "calibrate"):
+        if args.workers < 1:
+            sys.exit("❌ --workers must be at least 1")
+        if args.chunk < 1:
+            sys.exit("❌ --chunk must be at least 1")
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+from image_cache import (
+    ImageCache, CachedImage, board_cache_key, url_expiry, REFRESH_MARGIN, UNSIGNED_TTL
+)
+
+NOW = 1_700_000_000
+
+def signed_url(expires_at):
+    return f"https://cdn.discordapp.com/attachments/1/2/board_3.png?ex={expires_at:x}&is=0&hm=abc&"
+
+def image(message_id=1, size=1000, expires_at=NOW + 86400):
+    return CachedImage(signed_url(expires_at), message_id, size, NOW)
+
+def test_board_cache_key_depends_on_board_and_colors():
+    board = [["X", "", ""], ["", "O", ""], ["", "", ""]]
+    colors = [(1, 2, 3), (4, 5, 6)]
+    assert board_cache_key(board, colors) == "X...O....|(1, 2, 3)|(4, 5, 6)"
+    assert board_cache_key(board, colors[::-1]) != board_cache_key(board, colors)
+
+def test_url_expiry():
+    assert url_expiry(signed_url(NOW + 60), NOW) == NOW + 60
+    assert url_expiry("https://cdn.discordapp.com/a.png", NOW) == NOW + UNSIGNED_TTL
+    assert url_expiry("https://cdn.discordapp.com/a.png?ex=zz", NOW) == NOW + UNSIGNED_TTL
+
+def test_entries_go_stale_before_expiry():
+    entry = image(expires_at=NOW + 2 * REFRESH_MARGIN)
+    assert entry.is_fresh(NOW)
+    assert not entry.is_fresh(NOW + REFRESH_MARGIN)
+    entry.refresh(signed_url(NOW + 10 * REFRESH_MARGIN), NOW)
+    assert entry.is_fresh(NOW + REFRESH_MARGIN)
+
+def test_put_evicts_least_recently_used():
+    cache = ImageCache(max_entries=2)
+    a, b, c = image(1), image(2), image(3)
+    assert cache.put("a", a) == []
+    cache.put("b", b)
+    cache.get("a")
+    assert cache.put("c", c) == [b]
+    assert list(cache.entries) == ["a", "c"]
+
+def test_put_returns_replaced_entry():
+    cache = ImageCache(max_entries=2)
+    first, second = image(1), image(2)
+    cache.put("a", first)
+    assert cache.put("a", second) == [first]
+    assert cache.put("a", second) == []
+    assert cache.get("a") is second
+
+def test_counters_and_hit_rate():
+    cache = ImageCache()
+    entry = image(size=500)
+    cache.record_miss(500)
+    cache.record_hit(entry)
+    cache.record_hit(entry)
+    cache.record_refresh()
+
+    stats = cache.stats()
+    assert stats["hit_rate"] == 2 / 3
+    assert (stats["bytes_saved"], stats["bytes_uploaded"], stats["refreshes"]) == (1000, 500, 1)
+    assert ImageCache().stats()["hit_rate"] == 0.0
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "image_cache.json"
+    cache = ImageCache()
+    cache.put("a", image(1, 100))
+    cache.put("b", image(2, 200))
+    cache.record_hit(cache.get("a"))
+    assert cache.dirty
+    cache.save(path)
+    assert not cache.dirty
+
+    restored = ImageCache()
+    assert restored.load(path, NOW) == 2
+    assert list(restored.entries) == ["b", "a"]
+    assert restored.get("a").message_id == 1 and restored.get("a").is_fresh(NOW)
+    assert restored.stats()["bytes_saved"] == 100
+
+def test_load_missing_file(tmp_path):
+    assert ImageCache().load(tmp_path / "missing.json", NOW) == 0
@@ -0,0 +1,131 @@
+from matchmaking import (
+    MatchQueue, QueueEntry, BASE_WINDOW, WINDOW_STEP, WINDOW_INTERVAL, MAX_WINDOW,
+    update_ratings, ai_level_for_rating, load_ratings, save_ratings
+)
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+
+def entry(user_id, rating, guild_id=1, joined_at=0.0, **kwargs):
+    return QueueEntry(User(user_id), rating, guild_id, 100 + user_id, joined_at, **kwargs)
+
+def make_queue():
+    return MatchQueue(timeout=300, ai_fallback_after=60)
+
+def test_add_and_remove_keep_index_consistent():
+    queue = make_queue()
+    a, b, c = entry(1, 1000), entry(2, 1000), entry(3, 1200, guild_id=2, cross_guild=True)
+    for e in (a, b, c):
+        queue.add(e)
+
+    assert len(queue) == 3 and 1 in queue
+    assert queue.pools[1].ratings == [1000]
+    assert list(queue.pools[1].buckets[1000]) == [1, 2]
+    assert queue.pools["cross"].ratings == [1200]
+
+    assert queue.remove(1) is a
+    assert list(queue.pools[1].buckets[1000]) == [2]
+    queue.remove(2)
+    queue.remove(3)
+    assert queue.pools == {} and len(queue) == 0
+    assert queue.remove(3) is None
+
+def test_window_widens_in_steps_up_to_max():
+    e = entry(1, 1000)
+    assert e.window(0) == BASE_WINDOW
+    assert e.window(WINDOW_INTERVAL - 1) == BASE_WINDOW
+    assert e.window(WINDOW_INTERVAL) == BASE_WINDOW + WINDOW_STEP
+    assert e.window(10_000) == MAX_WINDOW
+
+def test_find_match_prefers_closest_rating_then_oldest():
+    queue = make_queue()
+    queue.add(entry(1, 1080, joined_at=0.0))
+    queue.add(entry(3, 1030, joined_at=1.0))
+    queue.add(entry(2, 1030, joined_at=2.0))
+    queue.add(entry(4, 960, joined_at=0.0))
+
+    match = queue.find_match(entry(5, 1010, joined_at=5.0), 5.0)
+    assert match.user.id == 3
+
+def test_find_match_only_sees_compatible_servers():
+    queue = make_queue()
+    queue.add(entry(1, 1000, guild_id=2))
+    queue.add(entry(2, 1000, guild_id=3, cross_guild=True))
+
+    assert queue.find_match(entry(3, 1000, guild_id=1), 0.0) is None
+    match = queue.find_match(entry(4, 1000, guild_id=1, cross_guild=True), 0.0)
+    assert match.user.id == 2
+
+def test_find_match_respects_window():
+    queue = make_queue()
+    queue.add(entry(1, 1000 + BASE_WINDOW + 1))
+    assert queue.find_match(entry(2, 1000), 0.0) is None
+    # The waiting player's wider window is enough
+    assert queue.find_match(entry(3, 1000, joined_at=WINDOW_INTERVAL), WINDOW_INTERVAL).user.id == 1
+
+def test_sweep_matches_once_windows_widen():
+    queue = make_queue()
+    queue.add(entry(1, 1000, joined_at=0.0))
+    queue.add(entry(2, 1000 + BASE_WINDOW + WINDOW_STEP, joined_at=1.0))
+
+    assert queue.sweep(WINDOW_INTERVAL - 1) == ([], [], [])
+    matches, _, _ = queue.sweep(WINDOW_INTERVAL)
+    assert [(a.user.id, b.user.id) for a, b in matches] == [(1, 2)]
+    assert len(queue) == 0
+
+def test_sweep_falls_back_to_ai_or_times_out():
+    queue = make_queue()
+    queue.add(entry(1, 1000, guild_id=1))
+    queue.add(entry(2, 1000, guild_id=2, ai_fallback=False))
+
+    _, fallbacks, timed_out = queue.sweep(60)
+    assert [e.user.id for e in fallbacks] == [1] and timed_out == []
+
+    _, fallbacks, timed_out = queue.sweep(300)
+    assert fallbacks == [] and [e.user.id for e in timed_out] == [2]
+    assert (queue.ai_fallbacks, queue.timeouts, len(queue)) == (1, 1, 0)
+
+def test_sweep_skips_players_who_left():
+    queue = make_queue()
+    queue.add(entry(1, 1000))
+    queue.remove(1)
+    assert queue.sweep(1000) == ([], [], [])
+
+def test_sweep_batches_retries():
+    queue = make_queue()
+    for i in range(10):
+        queue.add(entry(i, 1000 + i * 1000, guild_id=i))
+    queue.sweep(WINDOW_INTERVAL, batch=3)
+    assert len(queue.widenings) == 10
+
+def test_stats_percentiles():
+    queue = make_queue()
+    for i in range(10):
+        queue.record_match(entry(2 * i, 1000, joined_at=0.0), entry(2 * i + 1, 1000, joined_at=0.0), float(i + 1))
+
+    stats = queue.stats()
+    assert stats["matches"] == 10
+    assert stats["avg_wait"] == 5.5
+    assert stats["p50_wait"] == 6.0
+    assert stats["p90_wait"] == 10.0
+    assert stats["max_wait"] == 10.0
+
+def test_stats_empty():
+    assert make_queue().stats()["p90_wait"] == 0.0
+
+def test_update_ratings_is_zero_sum():
+    assert update_ratings(1000, 1000, 1) == (1016, 984)
+    assert update_ratings(1000, 1000, 0.5) == (1000, 1000)
+
+def test_ai_level_for_rating_uses_loss_rates():
+    rates = {"easy": 0.9, "casual": 0.3, "medium": 0.05, "hard": 0.0}
+    assert ai_level_for_rating(600, rates) == "easy"
+    assert ai_level_for_rating(1000, rates) == "casual"
+    assert ai_level_for_rating(1300, rates) == "hard"
+
+def test_ratings_round_trip(tmp_path):
+    path = tmp_path / "ratings.json"
+    assert load_ratings(path) == {}
+    save_ratings(path, {123: 1016, 456: 984})
+    assert load_ratings(path) == {123: 1016, 456: 984}
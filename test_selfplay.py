@@ -0,0 +1,67 @@
+import json
+import random
+
+import game_logic
+from game_logic import board_key, search_hard_move, load_difficulties, custom_levels
+from selfplay import (
+    RECORD, NO_MOVE, X_WINS, write_header, read_results, make_tasks, play_game
+)
+
+def test_board_key_is_from_the_movers_view():
+    # The bot's AI plays O first, the book is built from X-first games
+    x_first = [["X", "", ""], ["", "O", ""], ["", "", ""]]
+    o_first = [["O", "", ""], ["", "X", ""], ["", "", ""]]
+    assert board_key(x_first, "X") == board_key(o_first, "O") == "X...O...."
+    assert board_key(x_first, "O") == "O...X...."
+
+def test_book_move_applies_to_either_mark():
+    x_first = [["X", "", ""], ["", "O", ""], ["", "", ""]]
+    o_first = [["O", "", ""], ["", "X", ""], ["", "", ""]]
+    assert search_hard_move(x_first, "X") == search_hard_move(o_first, "O")
+
+def test_record_round_trip(tmp_path):
+    path = tmp_path / "selfplay.bin"
+    random.seed(1)
+    outcome, moves = play_game(("hard", None), ("easy", None))
+    with open(path, "wb") as f:
+        write_header(f, ["hard", "easy"])
+        f.write(RECORD.pack(0, 1, outcome, bytes(moves).ljust(9, bytes([NO_MOVE]))))
+        f.write(RECORD.pack(1, 0, X_WINS, bytes([4, 0, 1, 3, 7]).ljust(9, bytes([NO_MOVE]))))
+
+    games = list(read_results(path))
+    assert games[0] == (["hard", "easy"], (0, 1, outcome, moves))
+    assert games[1][1] == (1, 0, X_WINS, [4, 0, 1, 3, 7])
+
+def test_read_results_ignores_partial_record(tmp_path):
+    path = tmp_path / "selfplay.bin"
+    with open(path, "wb") as f:
+        write_header(f, ["easy"])
+        f.write(RECORD.pack(0, 0, X_WINS, bytes([0, 3, 1, 4, 2]).ljust(9, bytes([NO_MOVE]))))
+        f.write(b"\x00\x00\x01")
+    assert len(list(read_results(path))) == 1
+
+def test_load_difficulties_skips_invalid_levels(tmp_path):
+    path = tmp_path / "difficulties.json"
+    path.write_text(json.dumps({
+        "Casual": {"perfect_rate": 0.8},
+        "hard": {"perfect_rate": 0.5},
+        "bad name": {"perfect_rate": 0.5},
+        "text": {"perfect_rate": "high"},
+        "above": {"perfect_rate": 1.5},
+        "flag": {"perfect_rate": True},
+        "missing": {},
+        "scalar": 3
+    }))
+    try:
+        assert load_difficulties(path) == 1
+        assert custom_levels == {"casual": {"perfect_rate": 0.8}}
+    finally:
+        game_logic.custom_levels.clear()
+
+def test_make_tasks_splits_games_into_chunks():
+    pairings = [(0, 1, ("easy", None), ("hard", None)), (1, 0, ("hard", None), ("easy", None))]
+    tasks = make_tasks(pairings, 12, 5, random.Random(0), False)
+
+    assert [task[4] for task in tasks] == [5, 5, 2, 5, 5, 2]
+    assert [task[:2] for task in tasks] == [(0, 1)] * 3 + [(1, 0)] * 3
+    assert len({task[5] for task in tasks}) == len(tasks)  # Each chunk gets its own seed